@@ -2,221 +2,135 @@
 import re
 import unittest
 from typing import Union
-from datetime import datetime, date
+from datetime import date
 from collections import defaultdict
-from abc import ABC, abstractmethod
 
 
-class BaseStat(ABC):
-    """Абстрактный класс статистики."""
-
-    @abstractmethod
-    def update(self):
-        """Обновление статистики."""
-        pass
-
-    # @property
-    @abstractmethod
-    def value(self):
-        """Получение значения статистики."""
-        pass
-
-
-class SlowestPageStat(BaseStat):
-    def __init__(self):
-        self._max_time = 0
-        self._value = ""
-
-    def update(self, time, page):
-        if time >= self._max_time:
-            self._value = page
-            self._max_time = time
-
-    def value(self):
-        return self._value
-
-
-class FastestPageStat(BaseStat):
-    def __init__(self):
-        self._min_time = 10**10
-        self._value = ""
-
-    def update(self, time, page):
-        if time <= self._min_time:
-            self._value = page
-            self._min_time = time
-
-    def value(self):
-        return self._value
-
-
-class SlowestAveragePageStat(BaseStat):
-    def __init__(self):
-        self._pages = defaultdict(Page)
-
-    def update(self, time, page):
-        self._pages[page].add_time(time)
-
-    def value(self):
-        return Page.max(self._pages) if self._pages else ""
-
-
-class MostPopularPageStat(BaseStat):
-    def __init__(self):
-        self._pages = defaultdict(int)
-
-    def update(self, page):
-        self._pages[page] += 1
-
-    def value(self):
-        return lexicographic_min(self._pages)
-
-
-class MostActiveСlientStat(BaseStat):
-    def __init__(self):
-        self._clients = defaultdict(int)
-
-    def update(self, client):
-        self._clients[client] += 1
-
-    def value(self):
-        return lexicographic_min(self._clients)
-
-
-class MostPopularBrowserStat(BaseStat):
-    def __init__(self):
-        self._browsers = defaultdict(int)
-
-    def update(self, browser):
-        self._browsers[browser] += 1
-
-    def value(self):
-        return lexicographic_min(self._browsers)
-
-
-class MostActiveСlientByDayStat(BaseStat):
-    def __init__(self, date: datetime.date):
-        self._date = date
-        self._clients = defaultdict(int)
-
-    def update(self, date, client):
-        if self._date != date:
-            return
-        self._clients[client] += 1
-
-    def value(self):
-        return {self._date: lexicographic_min(self._clients)}
-
-
-class Page():
-    def __init__(self) -> None:
-        self._total_time = 0
-        self._count = 0
-        self._avg_time = 0
-
-    def add_time(self, time: int) -> None:
-        """Добавляет время обработки новой страницы."""
-        self._total_time += time
-        self._count += 1
-        self.calculate_avg_time()
-
-    def calculate_avg_time(self) -> float:
-        """Пересчитывает среднее время."""
-        self._avg_time = self._total_time / self._count
-
-    def avg_time(self) -> float:
-        """Возвращет среднее время обработки."""
-        return self._avg_time
-
-    @staticmethod
-    def max(pages: dict) -> str:
-        """Возвращает имя страницы с максимальным средним временем
-           обработки."""
-        pages_avg_time = pages.values()
-        pages_names = pages.keys()
-        max_avg_time = max(pages_avg_time, key=lambda x: x.avg_time())
-        for name in pages_names:
-            if abs(pages[name].avg_time() - max_avg_time.avg_time()) < 0.1**6:
-                return name
+_MONTHS = {
+    "Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4, "May": 5, "Jun": 6,
+    "Jul": 7, "Aug": 8, "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12,
+}
+
+_LOG_RE = re.compile(
+    r"^(?P<IP>(?:\d{1,3}\.){3}\d{1,3})\s-\s-\s"
+    r"\[(?P<day>\d{1,2})/(?P<month>%s)/(?P<year>\d{4})"
+    r":\d{1,2}:\d{1,2}:\d{1,2}\s[+-]\d{4}\]"
+    r'\s"(?:GET|PUT|POST|HEAD|OPTIONS|DELETE)\s'
+    r'(?P<page>\S+).\S+" \d+ \d+ "\S+\s"'
+    r'(?P<User_Agent>.+)"(?:\s(?P<time>\d+))?\s*$'
+    % "|".join(_MONTHS)
+)
+_LOG_RE_MATCH = _LOG_RE.match
+
+
+def _parse_line(line: str, _match=_LOG_RE_MATCH, _int=int, _months=_MONTHS,
+                _date=date) -> Union[tuple, None]:
+    """Разбивает лог на элементы и приводит их к нужным типам. Возвращает
+       кортеж (IP, дата, страница, User-Agent, время или None) или None,
+       если строка не является логом."""
+    if not line or not line[0].isdigit():
+        return None
+    data = _match(line)
+    if data is None:
+        return None
+    ip, day, month, year, page, user_agent, time = data.groups()
+    try:
+        day = _date(_int(year), _months[month], _int(day))
+    except ValueError:
+        return None
+    return ip, day, page, user_agent, _int(time) if time else None
 
 
 class Parser:
     """Класс парсера логов."""
 
-    PATTERN = re.compile(
-        r"(?P<IP>(\d{1,3}\.){3}\d{1,3})\s-\s-\s"
-        r'\[(?P<date>.+)\]\s"(GET|PUT|POST|HEAD|OPTIONS|DELETE)\s'
-        r'(?P<page>(\S+)).\S+" \d+ \d+ "\S+\s"'
-        r'(?P<User_Agent>(.+))"(\s(?P<time>(\d+)))?'
-    )
-
-    @classmethod
-    def parse(cls, line: str) -> Union[dict, None]:
-        """Разбивает лог на элементы."""
-        data = re.match(cls.PATTERN, line)
-        if not data:
-            return None
-        return cls.type_conversion(data.groupdict())
-
-    def type_conversion(group: dict) -> dict:
-        """Приводит элементы лога к нужным типам."""
-        group["date"] = datetime.strptime(
-            group["date"], "%d/%b/%Y:%H:%M:%S %z").date()
-        if group['time']:
-            group["time"] = int(group["time"])
-        return group
+    parse = staticmethod(_parse_line)
 
 
 class Statistics:
     def __init__(self) -> None:
-        self._fastest_page = FastestPageStat()
-        self._slowest_page = SlowestPageStat()
-        self._slowest_average_page = SlowestAveragePageStat()
-        self._most_popular_page = MostPopularPageStat()
-        self._most_active_client = MostActiveСlientStat()
-        self._most_popular_browser = MostPopularBrowserStat()
-        self._most_active_client_by_day = MostActiveСlientByDayStat(
-            date(2012, 7, 8))
+        self._fast_t, self._fast_p = 10**10, ""
+        self._slow_t, self._slow_p = 0, ""
+        self._page_total = defaultdict(int)
+        self._page_count = defaultdict(int)
+        self._day = date(2012, 7, 8)
+        self._pages = defaultdict(int)
+        self._clients = defaultdict(int)
+        self._browsers = defaultdict(int)
+        self._day_clients = defaultdict(int)
 
     def add_line(self, line: str) -> None:
         """Обрабатывает строку лога."""
-        grouped_data = Parser.parse(line)
-        if grouped_data:
-            self.update(grouped_data)
-
-    def update(self, group: dict) -> None:
-        """Обновляет статистику."""
-        if group['time']:
-            self._fastest_page.update(group["time"], group["page"])
-            self._slowest_page.update(group["time"], group["page"])
-            self._slowest_average_page.update(group["time"], group["page"])
-
-        self._most_popular_page.update(group["page"])
-        self._most_active_client.update(group["IP"])
-        self._most_popular_browser.update(group["User_Agent"])
-        self._most_active_client_by_day.update(group["date"], group["IP"])
+        self.feed((line,))
+
+    def feed(self, lines) -> None:
+        """Обрабатывает последовательность строк лога. На время цикла всё
+           состояние статистики держится в локальных переменных."""
+        parse = _parse_line
+        fast_t, fast_p = self._fast_t, self._fast_p
+        slow_t, slow_p = self._slow_t, self._slow_p
+        page_total, page_count = self._page_total, self._page_count
+        pages, clients = self._pages, self._clients
+        browsers, day_clients = self._browsers, self._day_clients
+        target_day = self._day
+
+        for line in lines:
+            record = parse(line)
+            if not record:
+                continue
+            ip, day, page, user_agent, time = record
+            if time:
+                if time <= fast_t:
+                    fast_t, fast_p = time, page
+                if time >= slow_t:
+                    slow_t, slow_p = time, page
+                page_total[page] += time
+                page_count[page] += 1
+
+            pages[page] += 1
+            clients[ip] += 1
+            browsers[user_agent] += 1
+            if day == target_day:
+                day_clients[ip] += 1
+
+        self._fast_t, self._fast_p = fast_t, fast_p
+        self._slow_t, self._slow_p = slow_t, slow_p
 
     def results(self) -> dict:
         """Возвращает итоговую статистику."""
         return {
-            "FastestPage": self._fastest_page.value(),
-            "MostActiveClient": self._most_active_client.value(),
-            "MostActiveClientByDay": self._most_active_client_by_day.value(),
-            "MostPopularBrowser": self._most_popular_browser.value(),
-            "MostPopularPage": self._most_popular_page.value(),
-            "SlowestAveragePage": self._slowest_average_page.value(),
-            "SlowestPage": self._slowest_page.value(),
+            "FastestPage": self._fast_p,
+            "MostActiveClient": lexicographic_min(self._clients),
+            "MostActiveClientByDay": {
+                self._day: lexicographic_min(self._day_clients)},
+            "MostPopularBrowser": lexicographic_min(self._browsers),
+            "MostPopularPage": lexicographic_min(self._pages),
+            "SlowestAveragePage": max_average(self._page_total,
+                                              self._page_count),
+            "SlowestPage": self._slow_p,
         }
 
 
 def lexicographic_min(data: dict):
     """Возращает лексикографически наименьший ключ словаря
        с макимальным значением."""
-    if not data:
+    best_key, best_value = None, None
+    for key, value in data.items():
+        if (best_value is None or value > best_value
+                or (value == best_value and key < best_key)):
+            best_key, best_value = key, value
+    return best_key or ""
+
+
+def max_average(total: dict, count: dict) -> str:
+    """Возвращает ключ с максимальным средним значением total / count.
+       Среди ключей, чьё среднее отличается от максимума меньше чем на
+       1e-6, побеждает встреченный раньше."""
+    if not total:
         return ""
-    max_value = max(data.values())
-    for key in sorted(data.keys()):
-        if data[key] == max_value:
+    max_avg = max(value / count[key] for key, value in total.items())
+    for key, value in total.items():
+        if abs(value / count[key] - max_avg) < 0.1**6:
             return key
 
 
@@ -381,6 +295,103 @@ class LogStatTests(unittest.TestCase):
 
         self.assertDictEqual(test_method.results(), expected)
 
+    def test_max_average_tolerance(self):
+        total = {'a': 1.0, 'b': 1.0000009, 'c': 1.0000011}
+        count = {'a': 1, 'b': 1, 'c': 1}
+
+        self.assertEqual(max_average(total, count), 'b')
+
+    def test_escaped_quotes_in_user_agent(self):
+        record = Parser.parse(
+            '192.168.74.82 - - [08/Jul/2012:06:31:57 +0600]'
+            ' "GET /img/r.png HTTP/1.1" 304 211'
+            ' "http://callider/menu-top.php" "UA \\"q\\" z" 5'
+        )
+
+        self.assertEqual(record[3], 'UA \\"q\\" z')
+        self.assertEqual(record[4], 5)
+
+    def test_unescaped_quotes_in_user_agent(self):
+        record = Parser.parse(
+            '192.168.74.82 - - [08/Jul/2012:06:31:57 +0600]'
+            ' "GET /img/r.png HTTP/1.1" 304 211'
+            ' "http://callider/menu-top.php" "UA "q" z" 5'
+        )
+
+        self.assertEqual(record[3], 'UA "q" z')
+        self.assertEqual(record[4], 5)
+
+    def test_trailing_backslash_in_user_agent(self):
+        record = Parser.parse(
+            '192.168.74.82 - - [08/Jul/2012:06:31:57 +0600]'
+            ' "GET /img/r.png HTTP/1.1" 304 211'
+            ' "http://callider/menu-top.php" "UA\\" 5'
+        )
+
+        self.assertEqual(record[3], 'UA\\')
+        self.assertEqual(record[4], 5)
+
+    def test_malformed_dates(self):
+        for stamp in ('08/Jul/2012garbage', '08/Jly/2012:06:31:57 +0600',
+                      '31/Feb/2012:06:31:57 +0600', '08/Jul/12:06:31:57'):
+            with self.subTest(stamp):
+                self.assertIsNone(Parser.parse(
+                    '192.168.74.82 - - [%s]'
+                    ' "GET /img/r.png HTTP/1.1" 304 211'
+                    ' "http://callider/menu-top.php" "Mozilla/5.0" 5' % stamp
+                ))
+
+    def test_single_digit_day(self):
+        record = Parser.parse(
+            '192.168.74.82 - - [8/Jul/2012:06:31:57 +0600]'
+            ' "GET /img/r.png HTTP/1.1" 304 211'
+            ' "http://callider/menu-top.php" "Mozilla/5.0" 5'
+        )
+
+        self.assertEqual(record[1], date(2012, 7, 8))
+
+    def test_tab_separated_log(self):
+        record = Parser.parse(
+            '192.168.74.82\t-\t-\t[08/Jul/2012:06:31:57 +0600]\t'
+            '"GET /img/r.png HTTP/1.1" 304 211'
+            ' "http://callider/menu-top.php" "Mozilla/5.0" 5'
+        )
+
+        self.assertEqual(record[2], '/img/r.png')
+        self.assertEqual(record[4], 5)
+
+    def test_feed(self):
+        lines = [
+            '192.168.74.83 - - [08/Jul/2012:06:31:57 +0600]'
+            ' "GET /img/r.png HTTP/1.1" 304 211'
+            ' "http://callider/menu-top.php" "Mozilla/5.0 (compatible; MSIE'
+            ' 9.0; Windows NT 6.1; WOW64; Trident/5.0)" 170',
+            '192.fdfdfdfdfdfdfdfdf',
+            '192.168.74.81 - - [09/Jul/2012:06:31:57 +0600]'
+            ' "GET /img/agraph.png HTTP/1.1" 304 211'
+            ' "http://callider/menu-top.php" "Mozilla/5.0 (compatible; MSIE'
+            ' 9.0; Windows NT 6.1; WOW64; Trident/5.0)" 90',
+            '192.168.74.82 - - [08/Jul/2012:06:31:57 +0600]'
+            ' "GET /img/graph.png HTTP/1.1" 304 211'
+            ' "http://callider/menu-top.php" "Mozilla/5.0 (compatible; MSIE'
+            ' 9.0; Windows NT 6.1; WOW64; Trident/5.0)"',
+        ]
+        test_method = make_stat()
+        test_method.feed(lines[:2])
+        test_method.feed(iter(lines[2:]))
+
+        expected = {
+            'FastestPage': '/img/agraph.png',
+            'MostActiveClient': '192.168.74.81',
+            'MostActiveClientByDay': {date(2012, 7, 8): '192.168.74.82'},
+            'MostPopularBrowser': 'Mozilla/5.0 (compatible; MSIE'
+                                  ' 9.0; Windows NT 6.1; WOW64; Trident/5.0)',
+            'MostPopularPage': '/img/agraph.png',
+            'SlowestAveragePage': '/img/r.png',
+            'SlowestPage': '/img/r.png'}
+
+        self.assertDictEqual(test_method.results(), expected)
+
 
 if __name__ == '__main__':
     unittest.main()
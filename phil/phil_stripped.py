@@ -2,43 +2,81 @@
 from urllib.request import urlopen
 from urllib.parse import quote, unquote
 from urllib.error import URLError, HTTPError
+from functools import lru_cache
 import re
 
 
+_CHUNK_SIZE = 64 * 1024
+_CONTENT_BEGIN = b'<div id="mw-content-text"'
+_CONTENT_END = b'<div id="mw-navigation">'
+_LINK_RE = re.compile(rb"[\"']/wiki/([\w%\x80-\xff]+)[\"']", re.IGNORECASE)
+_LINK_NAME_RE = re.compile(r"[\w%]+")
+
+
 def get_content(name):
     """
-    Функция возвращает содержимое вики-страницы name из русской Википедии.
+    Функция возвращает в виде bytes содержимое статьи name из русской
+    Википедии — участок страницы от mw-content-text до mw-navigation.
+    Страница читается порциями, чтение прекращается, как только найден
+    mw-navigation. Успешно загруженные страницы кэшируются.
     В случае ошибки загрузки или отсутствия страницы возвращается None.
     """
     try:
-        with urlopen("http://ru.wikipedia.org/wiki/" + quote(name)) as page:
-            return page.read().decode("utf-8", errors="ignore")
+        return _fetch_content(name)
     except (URLError, HTTPError):
         return None
 
 
+@lru_cache(maxsize=1024)
+def _fetch_content(name):
+    """
+    Загружает статью name для get_content. Ошибки загрузки не перехватываются,
+    чтобы неудачные попытки не попадали в кэш.
+    """
+    buffer = bytearray()
+    finish = -1
+    with urlopen("http://ru.wikipedia.org/wiki/" + quote(name)) as page:
+        while finish == -1:
+            chunk = page.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            offset = max(0, len(buffer) - len(_CONTENT_END) + 1)
+            buffer += chunk
+            finish = buffer.find(_CONTENT_END, offset)
+    if finish == -1:
+        finish = len(buffer)
+    start = buffer.find(_CONTENT_BEGIN, 0, finish)
+    if start == -1:
+        return b""
+    return bytes(buffer[start:finish])
+
+
 def extract_content(page):
     """
     Функция принимает на вход содержимое страницы и возвращает 2-элементный
     tuple, первый элемент которого — номер позиции, с которой начинается
     содержимое статьи, второй элемент — номер позиции, на котором заканчивается
-    содержимое статьи.
+    содержимое статьи. get_content уже обрезает страницу по границам статьи,
+    поэтому интервал охватывает её целиком.
     Если содержимое отсутствует, возвращается (0, 0).
     """
-    start = re.search(r'<div id="mw-content-text"', page).start()
-    finish = re.search(r'<div id="mw-navigation">', page).start()
-    return (start, finish - 1) if (start != -1 and finish != -1) else None
+    return (0, len(page))
 
 
 def extract_links(page, begin, end):
     """
-    Функция принимает на вход содержимое страницы и начало и конец интервала,
-    задающего позицию содержимого статьи на странице и возвращает все имеющиеся
-    ссылки на другие вики-страницы без повторений и с учётом регистра.
+    Функция принимает на вход содержимое страницы (bytes) и начало и конец
+    интервала, задающего позицию содержимого статьи на странице, и возвращает
+    все имеющиеся ссылки на другие вики-страницы без повторений и с учётом
+    регистра. Байты вне ASCII декодируются как UTF-8, и имя ссылки должно
+    состоять только из букв, цифр, _ и %.
     """
-    return set(map(unquote, re.findall(r"[\"']/wiki/([\w%]+?)[\"']",
-                                       page[begin:end],
-                                       re.IGNORECASE)))
+    links = set()
+    for link in _LINK_RE.findall(page, begin, end):
+        name = link.decode("utf-8", errors="replace")
+        if _LINK_NAME_RE.fullmatch(name):
+            links.add(unquote(name))
+    return links
 
 
 def find_chain(start, finish):
@@ -52,23 +90,25 @@ def find_chain(start, finish):
         return [start]
 
     transitions = []
+    visited = set()
     name = start
 
-    while finish not in transitions:
+    while finish not in visited:
         page = get_content(name)
         if page is None:
             return None
         transitions.append(name)
+        visited.add(name)
 
         links = extract_links(page, *extract_content(page))
         if finish in links:
             return transitions + [finish]
-        name = get_next_page_name(links, transitions)
+        name = get_next_page_name(links, visited)
 
 
-def get_next_page_name(links: list, transitions: list) -> str:
+def get_next_page_name(links: set, visited: set) -> str:
     for link in links:
-        if link not in transitions:
+        if link not in visited:
             return link
 
 
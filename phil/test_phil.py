@@ -4,6 +4,8 @@ import phil_stripped as t
 from urllib.request import urlopen
 from urllib.parse import quote
 from urllib.error import URLError, HTTPError
+from unittest import mock
+import io
 import unittest
 
 
@@ -23,16 +25,17 @@ def _has_link(name, link):
 
 
 class TestLinksExtractor(unittest.TestCase):
-    TEXT = '<a href="/wiki/A">t</a>text<a href="/wiki/B">t</a>'
+    TEXT = b'<a href="/wiki/A">t</a>text<a href="/wiki/B">t</a>'
 
-    def _check_with_bound(self, text, begin, end, links=None):
+    def _check_with_bound(self, data, begin, end, links=None):
         if links is None:
             links = set()
 
-        self.assertSetEqual(set(t.extract_links(text, begin, end)), links)
+        self.assertSetEqual(set(t.extract_links(data, begin, end)), links)
 
     def _check(self, text, links=None):
-        self._check_with_bound(text, 0, len(text), links)
+        data = text.encode()
+        self._check_with_bound(data, 0, len(data), links)
 
     def test_category(self):
         self._check('<a href="/wiki/category:unknown%2ecategory">text</a>')
@@ -57,6 +60,14 @@ class TestLinksExtractor(unittest.TestCase):
         self._check(
             '<a href="/wiki/46_%D0%B3%D0%BE" title="qq">x</a>', {'46_го'})
 
+    def test_raw_utf8_link(self):
+        self._check('<a href="/wiki/Кот">x</a>', {'Кот'})
+
+    def test_raw_utf8_non_word_link(self):
+        self._check('<a href="/wiki/Кот—пёс">x</a>')
+        self._check('<a href="/wiki/Кот\u00a0пёс">x</a>')
+        self._check('<a href="/wiki/«Кот»">x</a>')
+
     def test_link_case_sensitivity(self):
         self._check(
             '<a href="/wiki/L">t1</a><a href="/wiki/l">t2</a>', {'L', 'l'})
@@ -66,7 +77,7 @@ class TestLinksExtractor(unittest.TestCase):
     def test_multiple_links(self):
         self._check("""<a href="/wiki/L">t1</a><a href='/wiki/l'>t2</a>"""
                     """<a href='/wiki/L'>t3</a>""", {'L', 'l'})
-        self._check(self.TEXT, {'A', 'B'})
+        self._check_with_bound(self.TEXT, 0, len(self.TEXT), {'A', 'B'})
 
     def test_multiline(self):
         self._check("""<a href="/wiki/L">t1</a>
@@ -89,6 +100,50 @@ class TestLinksExtractor(unittest.TestCase):
         self._check_with_bound(self.TEXT, 10, len(self.TEXT) - 10)
 
 
+class TestContentLoader(unittest.TestCase):
+    BODY = b'<div id="mw-content-text"><a href="/wiki/A">t</a>'
+    PAGE = b'<head>x</head>' + BODY + b'<div id="mw-navigation">tail'
+
+    def setUp(self):
+        t._fetch_content.cache_clear()
+        self.addCleanup(t._fetch_content.cache_clear)
+
+    def _get(self, data, chunk_size=t._CHUNK_SIZE):
+        with mock.patch.object(t, 'urlopen',
+                               lambda url: io.BytesIO(data)), \
+                mock.patch.object(t, '_CHUNK_SIZE', chunk_size):
+            return t.get_content('name')
+
+    def test_chunk_boundaries(self):
+        end = self.PAGE.index(b'<div id="mw-navigation">')
+        for chunk_size in (1, 7, end + 5, len(self.PAGE), 64 * 1024):
+            with self.subTest(chunk_size):
+                t._fetch_content.cache_clear()
+                self.assertEqual(self._get(self.PAGE, chunk_size), self.BODY)
+
+    def test_missing_navigation(self):
+        self.assertEqual(self._get(b'<p>' + self.BODY, 7), self.BODY)
+
+    def test_missing_content(self):
+        self.assertEqual(self._get(b'<p>x</p><div id="mw-navigation">'), b'')
+
+    def test_failed_fetch_is_not_cached(self):
+        responses = [URLError('timeout'), io.BytesIO(self.PAGE)]
+
+        def urlopen(url):
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        with mock.patch.object(t, 'urlopen', urlopen):
+            self.assertIsNone(t.get_content('name'))
+            self.assertEqual(t.get_content('name'), self.BODY)
+            self.assertEqual(t.get_content('name'), self.BODY)
+        self.assertEqual(responses, [])
+
+
+
 class TestChainFinder(unittest.TestCase):
     def assertIsEmptyChain(self, chain):
         self.assertIsNone(chain)
@@ -137,7 +192,7 @@ class TestChainFinder(unittest.TestCase):
 
 def make_suite():
     suite = unittest.TestSuite()
-    for test in (TestLinksExtractor, TestChainFinder):
+    for test in (TestLinksExtractor, TestContentLoader, TestChainFinder):
         suite.addTests(unittest.defaultTestLoader.loadTestsFromTestCase(test))
     return suite
 